@@ -1,14 +1,18 @@
 import os
-import json
 import asyncio
-import subprocess
+import logging
+import itertools
+from contextlib import asynccontextmanager
 from datetime import date
 
 import httpx
+import orjson
+import ahocorasick
 from fastapi import FastAPI, Query, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 from better_profanity import profanity
+from better_profanity.constants import ALLOWED_CHARACTERS
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -17,10 +21,101 @@ class ProfanityRequest(BaseModel):
     url: str 
 
 
-app = FastAPI()
+def _build_profanity_automaton():
+    # Every spelling better_profanity accepts (its CHARS_MAPPING substitutions)
+    profanity.load_censor_words()
+    automaton = ahocorasick.Automaton()
+    for word in profanity.CENSOR_WORDSET:
+        options = [profanity.CHARS_MAPPING.get(c, (c,)) for c in str(word)]
+        for combo in itertools.product(*options):
+            variant = "".join(combo)
+            if variant:
+                automaton.add_word(variant, len(variant))
+    automaton.make_automaton()
+    return automaton
+
+
+_PROFANITY_AC = _build_profanity_automaton()
+
+
+def _censor_ac(text: str, censor_char: str = "*") -> str:
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # Lowercasing changed offsets (rare unicode), use the slow path
+        return profanity.censor(text, censor_char)
+
+    # Whole-word matches only, like better_profanity, so "class" stays intact
+    n = len(text)
+    spans = []
+    for end, length in _PROFANITY_AC.iter(lowered):
+        start = end - length + 1
+        if start > 0 and text[start - 1] in ALLOWED_CHARACTERS:
+            continue
+        if end + 1 < n and text[end + 1] in ALLOWED_CHARACTERS:
+            continue
+        spans.append((start, end + 1))
+    if not spans:
+        return text
+
+    # Longest match wins where spans overlap
+    spans.sort(key=lambda sp: (sp[0], -sp[1]))
+    out, pos = [], 0
+    for start, stop in spans:
+        if start < pos:
+            continue
+        out.append(text[pos:start])
+        out.append(censor_char * 4)
+        pos = stop
+    out.append(text[pos:])
+    return "".join(out)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled HTTP/2 client for the app's lifetime keeps upstream connections warm
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        timeout=10,
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=20),
+    )
+    try:
+        yield
+    finally:
+        await app.state.http.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
+logger = logging.getLogger("uvicorn.error")
+
 _crawl_lock = asyncio.Lock()
+_cleanup_tasks = set()
+# Time scrapy gets to finish in-flight requests and run closed() (which
+# flushes the seen store) after SIGTERM before it is killed
+_CRAWL_STOP_TIMEOUT = 60
+
+
+def _finish_crawl(proc, stderr_task):
+    # Synchronous so it is safe from except/finally blocks of a cancelled task;
+    # the waiting runs in a detached task that the cancellation can't interrupt.
+    async def reap():
+        try:
+            if proc is not None and proc.returncode is None:
+                proc.terminate()
+                try:
+                    await asyncio.wait_for(proc.wait(), _CRAWL_STOP_TIMEOUT)
+                except asyncio.TimeoutError:
+                    proc.kill()
+                    await proc.wait()
+        finally:
+            if stderr_task is not None:
+                stderr_task.cancel()
+            _crawl_lock.release()
+
+    task = asyncio.create_task(reap())
+    _cleanup_tasks.add(task)
+    task.add_done_callback(_cleanup_tasks.discard)
 
-@app.get("/scrape", response_class=JSONResponse)
+@app.get("/scrape", response_class=StreamingResponse)
 async def scrape(
     cutoff: str = Query("2025-01-01")
 ):
@@ -32,94 +127,135 @@ async def scrape(
     if _crawl_lock.locked():
         raise HTTPException(status_code=409, detail="Crawler is already running")
 
-    async with _crawl_lock:
+    await _crawl_lock.acquire()
 
-        file_path = "res.jsonl"
-
-        cmd = [
-            os.sys.executable, "-m", "scrapy", "crawl", "tm_sections",
-            "-a", f"cutoff={cutoff}",
-            "-O", file_path,
-            "-s", "LOG_LEVEL=ERROR"
-        ]
+    cmd = [
+        os.sys.executable, "-m", "scrapy", "crawl", "tm_sections",
+        "-a", f"cutoff={cutoff}",
+        "-O", "-:jsonlines",
+        "-s", "LOG_LEVEL=ERROR"
+    ]
+    proc = stderr_task = None
+    try:
         try:
-            proc = await asyncio.to_thread(
-                subprocess.run,
-                cmd,
-                capture_output=True,
-                text=True,
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
                 cwd="themanufacturer",
                 env={**os.environ, "PYTHONIOENCODING": "utf-8"},
+                limit=16 * 1024 * 1024,  # one jsonlines item per line, article bodies can be long
             )
-        except subprocess.TimeoutExpired:
-            raise HTTPException(status_code=504, detail="Scrape timed out")
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to launch scrapy: {e}")
 
-        if proc.returncode != 0:
-            err = (proc.stderr or "").strip()
-            raise HTTPException(status_code=500, detail=f"Scrapy failed: {err[:4000]}")
+        # Drain stderr concurrently so a chatty crawl can't block on a full pipe
+        stderr_task = asyncio.create_task(proc.stderr.read())
+
+        # Wait for the first item (or exit) so startup failures still map to a 500
+        first = await proc.stdout.readline()
+        if not first:
+            await proc.wait()
+            if proc.returncode != 0:
+                err = (await stderr_task).decode("utf-8", "replace").strip()
+                raise HTTPException(status_code=500, detail=f"Scrapy failed: {err[:4000]}")
+    except BaseException:
+        _finish_crawl(proc, stderr_task)
+        raise
 
+    async def stream_items():
+        # Items are re-emitted as a JSON array without being parsed or buffered
         try:
+            yield b"["
+            line, sep = first, b""
+            while line:
+                line = line.strip()
+                if line:
+                    yield sep + line
+                    sep = b","
+                line = await proc.stdout.readline()
+            yield b"]"
+            await proc.wait()
+            if proc.returncode != 0:
+                # Too late to change the status code; at least leave a trace
+                err = (await stderr_task).decode("utf-8", "replace").strip()
+                logger.error("Scrapy exited with code %s after streaming started: %s",
+                             proc.returncode, err[:4000])
+        finally:
+            _finish_crawl(proc, stderr_task)
 
-            json_list = []
-            file_path = f"./themanufacturer/{file_path}"
-            with open(file_path, "r", encoding="utf-8") as f:
-                for line in f:
-                    if line.strip():
-                        json_list.append(json.loads(line))
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Could not read/parse output file: {e}")
+    # Start the generator now so its finally is armed: if Starlette drops the
+    # response before iterating it, asyncio still closes a started generator.
+    items = stream_items()
+    opening = await items.__anext__()
+
+    async def body():
+        try:
+            yield opening
+            async for chunk in items:
+                yield chunk
+        finally:
+            await items.aclose()
 
-        return JSONResponse(content=json_list)
+    return StreamingResponse(body(), media_type="application/json")
 
 
-@app.post("/profanity", response_class=JSONResponse)
+@app.post("/profanity", response_class=ORJSONResponse)
 async def check_profanity(request: ProfanityRequest):
     url , text = request.url, request.text
-    return JSONResponse(content={"text": profanity.censor(text) , "url": url})
+    censored = await asyncio.to_thread(_censor_ac, text)
+    return ORJSONResponse(content={"text": censored , "url": url})
 
 
-@app.get("/stocks", response_class=JSONResponse)
+@app.get("/stocks", response_class=ORJSONResponse)
 async def stocks():
     try:
         SYMBOLS_MAP = os.environ.get("SYMBOL_MAP", '{}')
         ALPHAVANTAGE_API_KEY= os.environ.get("ALPHAVANTAGE_API_KEY")
         print(ALPHAVANTAGE_API_KEY, SYMBOLS_MAP)
         successful_stocks = []
+
+        sem = asyncio.Semaphore(5)
+        pace = asyncio.Lock()
+        rate = 1  # Rate limit: 1 request per second
+
+        async def fetch(client, company, symbol):
+            url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={symbol}&apikey={ALPHAVANTAGE_API_KEY}"
+            async with sem:
+                # Space out request starts; the requests themselves overlap
+                async with pace:
+                    await asyncio.sleep(1 / rate)
+                response = await client.get(url)
+            print(company, symbol, response.status_code, response)
+
+            if response.status_code != 200:
+                return None
+            stock_data = orjson.loads(response.content)
+            # Only add to output if we got valid data
+            res = {}
+            res["output"] = {
+                "company": company,
+                "symbol": symbol,
+                "data": stock_data
+            }
+            return res
+
+        client = app.state.http
+        tasks = [
+            fetch(client, company, symbol)
+            for company, symbol in orjson.loads(SYMBOLS_MAP).items()
+            if symbol
+        ]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        # Failed requests (httpx.RequestError or anything else) are skipped
+        for res in results:
+            if isinstance(res, dict):
+                successful_stocks.append(res)
+
+        return ORJSONResponse(content=successful_stocks)
         
-        async with httpx.AsyncClient() as client:
-            await asyncio.sleep(5)  # Rate limit: 1 request per second
-            for company, symbol in json.loads(SYMBOLS_MAP).items():
-                if not symbol:
-                    continue
-
-                url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={symbol}&apikey={ALPHAVANTAGE_API_KEY}"
-                
-                try:
-                    response = await client.get(url)
-                    print(company, symbol, response.status_code, response)
-                    
-                    if response.status_code == 200:
-                        stock_data = response.json()
-                        # Only add to output if we got valid data
-                        res = {}
-                        res["output"] = {
-                            "company": company,
-                            "symbol": symbol,
-                            "data": stock_data
-                        }
-                        successful_stocks.append(res)
-                    
-                except httpx.RequestError as e:
-                    continue
-                    
-                except Exception as e:
-                    continue
-                    
-        return JSONResponse(content=successful_stocks)
-        
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         raise HTTPException(status_code=500, detail="Invalid SYMBOL_MAP configuration in environment")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing stocks: {str(e)}")
@@ -1,10 +1,13 @@
 import os
 import re
 import sqlite3
+import hashlib
 import datetime as dt
+from functools import lru_cache
 import urllib.parse as urlparse
 import scrapy
-from w3lib.html import remove_tags, replace_escape_chars
+from scrapy.selector import SelectorList
+from lxml.etree import XPath, tostring
 
 try:
     from langdetect import detect, DetectorFactory 
@@ -12,50 +15,185 @@ try:
 except Exception:
     detect = None  
 
+try:
+    import lmdb
+except Exception:
+    lmdb = None
+
+LID_MODEL_PATH = os.environ.get("TM_LID_MODEL", "lid.176.ftz")
+try:
+    import fasttext
+    _LID = fasttext.load_model(LID_MODEL_PATH)
+except Exception:
+    _LID = None
+
 
 STATE_DIR = os.environ.get("TM_STATE_DIR", ".state")
 os.makedirs(STATE_DIR, exist_ok=True)
 SEEN_DB_PATH = os.path.join(STATE_DIR, "themanufacturer_seen.sqlite")
-TM_DOMAINS = {"themanufacturer.com", "www.themanufacturer.com"}
+SEEN_LMDB_PATH = os.path.join(STATE_DIR, "seen.lmdb")
+# "sqlite" (default) or "lmdb"
+SEEN_BACKEND = os.environ.get("TM_SEEN_BACKEND", "sqlite").lower()
+TM_DOMAINS = ("themanufacturer.com", "www.themanufacturer.com")
+
+def _cls(name: str) -> str:
+    # XPath equivalent of the CSS ".name" class test
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+# Compiled once, evaluated directly against response.selector.root.
+# smart_strings=False: plain str results, not ones that keep the parsed page alive
+_MENU_XP = XPath("//*[@id='menu-channels']//a/@href", smart_strings=False)
+_HEADER_CHANNEL_XP = XPath("//header//a[contains(@href, '/channel/')]/@href", smart_strings=False)
+# Also covers h3.item-title / div.item-excerpt links: only /articles/ hrefs are kept
+_ARTICLE_XP = XPath("//a[contains(@href, '/articles/')]/@href", smart_strings=False)
+_NEXT_PAGE_XPS = (
+    XPath(f"//a[{_cls('next')} and {_cls('page-numbers')}]/@href", smart_strings=False),
+    XPath(f"//a[{_cls('next')}]/@href", smart_strings=False),
+    XPath("//link[@rel='next']/@href", smart_strings=False),
+)
+_TITLE_XPS = (
+    XPath(f"//h1[{_cls('page-title')}]//span/text()", smart_strings=False),
+    XPath(f"//h1[{_cls('page-title')}]/text()", smart_strings=False),
+)
+_DATE_XP = XPath("//*[@id='single-article-date']/text()", smart_strings=False)
+_COMPANY_XP = XPath(f"//div[{_cls('article-company')}]//a/text()", smart_strings=False)
+_TAGS_XP = XPath(f"//div[{_cls('post-terms')}]//ul[{_cls('post-tags')}]//a/text()", smart_strings=False)
+
+# Candidate article containers, most specific first
+_BODY_CLASSES = ("single-article-content", "entry-content", "article-content")
+_BODY_CSS = ", ".join([f"div.{c}" for c in _BODY_CLASSES] + ["article"])
+_BODY_LINKS_XP = XPath(".//a/@href", smart_strings=False)
+# No container found: links and text blocks from the whole page in one walk
+_ARTICLE_COLLECT_XP = XPath("//a/@href | //p | //li | //h2 | //h3", smart_strings=False)
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_NBSP_RE = re.compile(r"&nbsp;|&#160;")
+_WS_RE = re.compile(r"[ \t]+")
+_NL_RE = re.compile(r"\n{3,}")
+_ORDINAL_RE = re.compile(r"(\d{1,2})(st|nd|rd|th)", re.IGNORECASE)
+# "12 March 2025" or "March 12 2025", after ordinals and commas are stripped
+_DATE_RE = re.compile(r"^(?:(\d{1,2})\s+([A-Za-z]+)|([A-Za-z]+)\s+(\d{1,2}))\s+(\d{4})$")
+_MONTHS = {
+    "jan": 1, "january": 1,
+    "feb": 2, "february": 2,
+    "mar": 3, "march": 3,
+    "apr": 4, "april": 4,
+    "may": 5,
+    "jun": 6, "june": 6,
+    "jul": 7, "july": 7,
+    "aug": 8, "august": 8,
+    "sep": 9, "september": 9,
+    "oct": 10, "october": 10,
+    "nov": 11, "november": 11,
+    "dec": 12, "december": 12,
+}
 
 class SeenStore:
+    _BATCH = 500
+
     def __init__(self, path: str):
-        self.conn = sqlite3.connect(path)
+        # Autocommit mode: no implicit BEGIN, transactions are opened explicitly
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        # page_size only takes effect before the first table is created
+        self.conn.execute("PRAGMA page_size=4096")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA cache_size=-65536")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute("PRAGMA busy_timeout=60000")
         self.conn.execute(
             "CREATE TABLE IF NOT EXISTS seen (url TEXT PRIMARY KEY, first_seen TEXT)"
         )
-        self.conn.commit()
+        # Preload every seen URL so has() never goes to SQLite
+        self._cache = {r[0] for r in self.conn.execute("SELECT url FROM seen")}
+        # (url, first_seen) rows written in one transaction every _BATCH adds
+        self._buf = []
 
     def has(self, url: str) -> bool:
-        cur = self.conn.execute("SELECT 1 FROM seen WHERE url = ? LIMIT 1", (url,))
-        return cur.fetchone() is not None
+        return url in self._cache
 
     def add(self, url: str):
-        self.conn.execute(
-            "INSERT OR IGNORE INTO seen(url, first_seen) VALUES(?, ?)",
-            (url, dt.datetime.utcnow().isoformat(timespec="seconds")),
-        )
+        if url in self._cache:
+            return
+        self._cache.add(url)
+        self._buf.append((url, dt.datetime.utcnow().isoformat(timespec="seconds")))
+        if len(self._buf) >= self._BATCH:
+            self.flush()
+
+    def flush(self):
+        if not self._buf:
+            return
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO seen(url, first_seen) VALUES(?, ?)",
+                self._buf,
+            )
+        except Exception:
+            self.conn.rollback()
+            raise
         self.conn.commit()
+        self._buf.clear()
 
     def close(self):
         try:
+            self.flush()
             self.conn.close()
         except Exception:
             pass
 
 
+class LMDBSeenStore:
+    """Same interface as SeenStore, backed by an LMDB key set (sha1(url) -> first_seen)."""
+
+    def __init__(self, path: str, map_size: int = 1 << 30):
+        self.env = lmdb.open(path, map_size=map_size)
+        # Pending adds, written in a single write transaction on flush()/close()
+        self._buf = {}
+
+    def has(self, url: str) -> bool:
+        if url in self._buf:
+            return True
+        with self.env.begin() as txn:
+            return txn.get(self._key(url)) is not None
+
+    def add(self, url: str):
+        self._buf.setdefault(url, dt.datetime.utcnow().isoformat(timespec="seconds"))
+
+    def flush(self):
+        if not self._buf:
+            return
+        with self.env.begin(write=True) as txn:
+            for url, first_seen in self._buf.items():
+                txn.put(self._key(url), first_seen.encode(), overwrite=False)
+        self._buf.clear()
+
+    @staticmethod
+    def _key(url: str) -> bytes:
+        # Fixed 20-byte key: raw URLs can exceed LMDB's 511-byte max_key_size
+        return hashlib.sha1(url.encode()).digest()
+
+    def close(self):
+        try:
+            self.flush()
+        except Exception:
+            pass
+        finally:
+            self.env.close()
+
+
 def to_plain_text(html: str) -> str:
 
     if not html:
         return ""
-    text = replace_escape_chars(remove_tags(html), which_ones=("&nbsp;",)).strip()
-    text = re.sub(r"[ \t]+", " ", text)
-    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = _NBSP_RE.sub(" ", _TAG_RE.sub("", html)).strip()
+    text = _WS_RE.sub(" ", text)
+    text = _NL_RE.sub("\n\n", text)
     return text
 
 
 def strip_ordinals(s: str) -> str:
-    return re.sub(r"(\d{1,2})(st|nd|rd|th)", r"\1", s, flags=re.IGNORECASE)
+    return _ORDINAL_RE.sub(r"\1", s)
 
 
 def parse_date(date_str: str):
@@ -63,6 +201,17 @@ def parse_date(date_str: str):
     if not date_str:
         return None
     s = strip_ordinals(date_str.strip()).replace(",", "")
+    m = _DATE_RE.match(s)
+    if m:
+        d1, mon1, mon2, d2, y = m.groups()
+        month = _MONTHS.get((mon1 or mon2).lower())
+        if month:
+            try:
+                return dt.date(int(y), month, int(d1 or d2))
+            except ValueError:
+                return None
+
+    # Fallback for anything the fast path doesn't recognise
     fmts = [
         "%d %b %Y",  
         "%d %B %Y", 
@@ -78,17 +227,54 @@ def parse_date(date_str: str):
 
 
 
+def detect_language(text: str):
+    if not text:
+        return None
+    # 512 chars is plenty for language ID; identical prefixes hit the cache
+    return _lang_for(text[:512])
+
+
+@lru_cache(maxsize=2048)
+def _lang_for(prefix: str):
+    # fasttext (C++) when the lid.176 model is available, langdetect otherwise
+    try:
+        if _LID is not None:
+            labels, _ = _LID.predict(prefix.replace("\n", " "), k=1)
+            return labels[0].replace("__label__", "")
+        if detect:
+            return detect(prefix)
+    except Exception:
+        pass
+    return None
+
+
+def body_rank(el) -> int:
+    # Position of el's selector in _BODY_CLASSES; <article> ranks last
+    if el.tag == "div":
+        classes = (el.get("class") or "").split()
+        for rank, name in enumerate(_BODY_CLASSES):
+            if name in classes:
+                return rank
+    return len(_BODY_CLASSES)
+
+
+def first_match(xpaths, root):
+    for xp in xpaths:
+        found = xp(root)
+        if found:
+            return found[0]
+    return None
+
+
 def absolutize(base_url: str, href: str) -> str:
     if not href:
         return None
     return urlparse.urljoin(base_url, href)
 
+# Nav/footer links repeat on every page, so the same absolute URLs come up a lot
+@lru_cache(maxsize=8192)
 def is_internal(url: str) -> bool:
-    try:
-        netloc = urlparse.urlparse(url).netloc.lower()
-        return any(netloc.endswith(d) for d in TM_DOMAINS)
-    except Exception:
-        return False
+    return urlparse.urlsplit(url).netloc.lower().endswith(TM_DOMAINS)
 
 
 class TMSectionsSpider(scrapy.Spider):
@@ -108,6 +294,16 @@ class TMSectionsSpider(scrapy.Spider):
     custom_settings = {
         "ROBOTSTXT_OBEY": True,
         "DOWNLOAD_DELAY": 0.5,
+        "CONCURRENT_REQUESTS": 32,
+        "CONCURRENT_REQUESTS_PER_DOMAIN": 16,
+        "DOWNLOAD_TIMEOUT": 30,
+        "DNS_TIMEOUT": 10,
+        "COOKIES_ENABLED": False,
+        "REDIRECT_ENABLED": True,
+        "RETRY_TIMES": 1,
+        "AUTOTHROTTLE_ENABLED": True,
+        "AUTOTHROTTLE_TARGET_CONCURRENCY": 8.0,
+        "REACTOR_THREADPOOL_MAXSIZE": 20,
         "DEFAULT_REQUEST_HEADERS": {
             "User-Agent": "Mozilla/5.0 (compatible; TMResearchBot/1.0; +https://example.org/contact)"
         },
@@ -116,7 +312,12 @@ class TMSectionsSpider(scrapy.Spider):
     @classmethod
     def from_crawler(cls, crawler, *args, **kwargs):
         spider = super().from_crawler(crawler, *args, **kwargs)
-        spider.seen = SeenStore(SEEN_DB_PATH)
+        if SEEN_BACKEND == "lmdb" and lmdb is not None:
+            spider.seen = LMDBSeenStore(SEEN_LMDB_PATH)
+        else:
+            if SEEN_BACKEND == "lmdb":
+                spider.logger.warning("TM_SEEN_BACKEND=lmdb but lmdb is not installed; using SQLite.")
+            spider.seen = SeenStore(SEEN_DB_PATH)
         return spider
 
     def closed(self, reason):
@@ -124,9 +325,10 @@ class TMSectionsSpider(scrapy.Spider):
             self.seen.close()
 
     def parse(self, response):
-        section_links = set(response.css("#menu-channels a::attr(href)").getall())
+        root = response.selector.root
+        section_links = set(_MENU_XP(root))
         if not section_links:
-            section_links.update(response.css("header a[href*='/channel/']::attr(href)").getall())
+            section_links.update(_HEADER_CHANNEL_XP(root))
 
         section_links = {response.urljoin(u) for u in section_links if "/channel/" in u}
         if not section_links:
@@ -139,10 +341,8 @@ class TMSectionsSpider(scrapy.Spider):
         section_url = response.meta.get("section_url")
         article_count = response.meta.get("article_count", 0)
 
-        hrefs = set()
-        hrefs.update(response.css("h3.item-title a::attr(href)").getall())
-        hrefs.update(response.css("div.item-excerpt a::attr(href)").getall())
-        hrefs.update(response.css("a[href*='/articles/']::attr(href)").getall())
+        root = response.selector.root
+        hrefs = set(_ARTICLE_XP(root))
 
         new_articles = []
         for href in sorted({response.urljoin(h) for h in hrefs if "/articles/" in h}):
@@ -158,11 +358,7 @@ class TMSectionsSpider(scrapy.Spider):
             article_count += 1
 
         if article_count < 5:
-            next_page = (
-                response.css("a.next.page-numbers::attr(href)").get()
-                or response.css("a.next::attr(href)").get()
-                or response.css("link[rel='next']::attr(href)").get()
-            )
+            next_page = first_match(_NEXT_PAGE_XPS, root)
             if next_page:
                 yield response.follow(
                     next_page,
@@ -173,13 +369,11 @@ class TMSectionsSpider(scrapy.Spider):
     def parse_article(self, response):
 
         section_url = response.meta.get("section_url")
-        title = (
-            response.css("h1.page-title span::text").get()
-            or response.css("h1.page-title::text").get()
-        )
+        root = response.selector.root
+        title = first_match(_TITLE_XPS, root)
         title = title.strip() if title else None
 
-        date_str = response.css("#single-article-date::text").get()
+        date_str = first_match((_DATE_XP,), root)
         date_str = date_str.strip() if date_str else None
         parsed_date = parse_date(date_str) if date_str else None
 
@@ -187,45 +381,35 @@ class TMSectionsSpider(scrapy.Spider):
             self.logger.debug(f"SKIP old article {parsed_date} < {self.cutoff_date}: {response.url}")
             return
 
-        companies = [t.strip() for t in response.css("div.article-company a::text").getall() if t.strip()]
+        companies = [t.strip() for t in _COMPANY_XP(root) if t.strip()]
         company = ", ".join(companies) if companies else None
 
-        body_selectors = [
-            "div.single-article-content",
-            "div.entry-content",
-            "div.article-content",
-            "article",
-        ]
-        raw_html = ""
-        body = None
-        for sel in body_selectors:
-            body = response.css(sel)
-            if body:
-                raw_html = body.get(default="")
-                if raw_html:
-                    break
-        if not raw_html:
-            body = response
-            raw_html = "".join(response.css("p, li, h2, h3").getall())
+        # One pass over the DOM, then keep the matches of the most specific selector
+        body = response.css(_BODY_CSS)
+        if body:
+            best = min(body_rank(b.root) for b in body)
+            body = SelectorList(b for b in body if body_rank(b.root) == best)
+            raw_html = body.get(default="")
+            hrefs = [h for b in body for h in _BODY_LINKS_XP(b.root)]
+        else:
+            nodes = _ARTICLE_COLLECT_XP(root)
+            # Attribute results come back as strings, matched blocks as elements
+            hrefs = [n for n in nodes if isinstance(n, str)]
+            raw_html = "".join(
+                tostring(n, method="html", encoding="unicode", with_tail=False)
+                for n in nodes if not isinstance(n, str)
+            )
 
         text = to_plain_text(raw_html)
 
-        tags = [t.strip() for t in response.css("div.post-terms ul.post-tags a::text").getall() if t.strip()]
+        tags = [t.strip() for t in _TAGS_XP(root) if t.strip()]
 
-        internal_links = []
-        for a in body.css("a::attr(href)").getall():
-            u = absolutize(response.url, a)
-            if u and is_internal(u):
-                internal_links.append(u)
-        seen_u = set()
-        internal_links = [u for u in internal_links if not (u in seen_u or seen_u.add(u))]
+        internal_links = list(dict.fromkeys(
+            u for a in hrefs
+            if (u := absolutize(response.url, a)) and is_internal(u)
+        ))
 
-        language = None
-        if detect and text:
-            try:
-                language = detect(text)
-            except Exception:
-                language = None
+        language = detect_language(text)
 
         item = {
             "url": response.url,